@@ -1,28 +1,44 @@
 """Configuration management for Fast workout analyzer."""
 import os
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 
-# Load environment variables from .env file
-load_dotenv()
+# Parse .env exactly once at import time. Real environment variables
+# take precedence over the file, matching load_dotenv()'s default.
+_ENV = {**dotenv_values('.env'), **os.environ}
 
 class Config:
     """Configuration container for API credentials and settings."""
 
     # Intervals.icu credentials
-    INTERVALS_API_KEY = os.getenv("INTERVALS_API")
-    ATHLETE_ID = os.getenv("ATHLETE_ID")
+    INTERVALS_API_KEY = _ENV.get("INTERVALS_API")
+    ATHLETE_ID = _ENV.get("ATHLETE_ID")
 
     # OpenRouter credentials
-    OPENROUTER_API_KEY = os.getenv("OPENROUTER")
-    OPENROUTER_MODEL = os.getenv("OPENROUTER_MODEL", "google/gemini-2.5-flash")
+    OPENROUTER_API_KEY = _ENV.get("OPENROUTER")
+    OPENROUTER_MODEL = _ENV.get("OPENROUTER_MODEL", "google/gemini-2.5-flash")
+    # Optional cheaper model for narrow single-activity queries
+    OPENROUTER_FAST_MODEL = _ENV.get("OPENROUTER_FAST_MODEL")
 
     # Default settings
     DEFAULT_DAYS_LOOKBACK = 30
     INTERVALS_BASE_URL = "https://intervals.icu/api/v1"
 
+    # Opt-in on-disk cache for intervals.icu responses (FAST_HTTP_CACHE=1)
+    HTTP_CACHE_ENABLED = _ENV.get("FAST_HTTP_CACHE", "").lower() in ("1", "true", "yes")
+
+    # Opt-in compact JSON prompt context (FAST_COMPACT_PROMPT=1) - about
+    # half the input tokens of the Markdown context on long lookbacks
+    COMPACT_PROMPT = _ENV.get("FAST_COMPACT_PROMPT", "").lower() in ("1", "true", "yes")
+
+    # Set once validate() has passed so repeated calls are free
+    _validated = False
+
     @classmethod
     def validate(cls):
         """Validate that all required configuration is present."""
+        if cls._validated:
+            return True
+
         missing = []
 
         if not cls.INTERVALS_API_KEY:
@@ -38,4 +54,5 @@ class Config:
                 f"Please add them to your .env file"
             )
 
+        cls._validated = True
         return True
@@ -3,15 +3,14 @@
 Faster
 Fetches data from intervals.icu and analyzes it using LLM via OpenRouter.
 """
+import functools
 import sys
 import click
 from rich.console import Console
-from rich.panel import Panel
-from rich.markdown import Markdown
 
-from config import Config
-from intervals_client import IntervalsClient
-from llm_analyzer import LLMAnalyzer
+# Heavier imports (requests, openai, rich renderers) are deferred into
+# main() so --setup, --help and the no-query path start without paying
+# for them.
 
 # Use safe_box=True for Windows compatibility
 console = Console(force_terminal=True, legacy_windows=False)
@@ -47,6 +46,14 @@ def main(query, days, setup):
         console.print("\nFor setup help: faster --setup")
         return
 
+    from rich.live import Live
+    from rich.panel import Panel
+    from rich.markdown import Markdown
+
+    from config import Config
+    from intervals_client import IntervalsClient
+    from llm_analyzer import LLMAnalyzer
+
     try:
         # Validate configuration
         console.print("[cyan]Validating configuration...[/cyan]")
@@ -80,16 +87,30 @@ def main(query, days, setup):
         _, _, scope_desc = analyzer.filter_activities_by_query(training_data['activities'], query)
         console.print(f"[dim]Focus: {scope_desc}[/dim]")
 
-        analysis = analyzer.analyze(training_data, query)
+        # When stdout is piped, skip the rich Markdown render entirely
+        # and emit the raw analysis text
+        if not sys.stdout.isatty():
+            analysis = analyzer.analyze(training_data, query)
+            sys.stdout.write(analysis + "\n")
+            return
 
-        # Display results
+        # Stream the analysis into a live panel so output appears as
+        # soon as the model starts responding
         console.print("\n")
-        panel = Panel(
-            Markdown(analysis),
-            title="[bold cyan]Training Analysis[/bold cyan]",
-            border_style="cyan"
-        )
-        console.print(panel)
+
+        def render(text):
+            return Panel(
+                Markdown(text),
+                title="[bold cyan]Training Analysis[/bold cyan]",
+                border_style="cyan"
+            )
+
+        with Live(render(""), console=console, refresh_per_second=10) as live:
+            analysis = analyzer.analyze(
+                training_data, query,
+                on_delta=lambda text: live.update(render(text))
+            )
+            live.update(render(analysis))
 
     except ValueError as e:
         console.print(f"[red]Configuration Error:[/red] {e}")
@@ -105,9 +126,7 @@ def main(query, days, setup):
         sys.exit(1)
 
 
-def show_setup_instructions():
-    """Display setup instructions."""
-    instructions = """
+_SETUP_TEXT = """
 # Faster Setup Instructions
 
 ## 1. Get your intervals.icu API credentials
@@ -155,7 +174,19 @@ faster "How's my training this month?"
 - "What should I focus on to improve my 10K time?"
 - "Am I overtraining?"
 """
-    console.print(Markdown(instructions))
+
+
+@functools.lru_cache(maxsize=1)
+def _get_setup_md():
+    """Build (and cache) the rendered setup instructions."""
+    from rich.markdown import Markdown
+
+    return Markdown(_SETUP_TEXT)
+
+
+def show_setup_instructions():
+    """Display setup instructions."""
+    console.print(_get_setup_md())
 
 
 if __name__ == '__main__':
@@ -1,48 +1,459 @@
 """LLM integration for workout analysis using OpenRouter."""
-from openai import OpenAI
-from typing import Dict, Any, Optional
+import asyncio
+import functools
+import hashlib
+import orjson
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import islice
+from openai import AsyncOpenAI, OpenAI
+from typing import Callable, Dict, Any, Optional
 from config import Config
 
+# Fixed per-activity header row, compiled once instead of re-built as an
+# f-string for every activity
+_ACTIVITY_HEADER_TMPL = "\n**{i}. {name}** ({type}) - {date}\n"
+
+_SYSTEM_PROMPT = """You are an expert sports scientist and endurance coach providing detailed, specific training analysis.
+
+CRITICAL: Be concise but complete. Use short, direct sentences. Avoid repetition and filler words.
+
+IMPORTANT: Check "Analysis Scope" - if user asks about specific workout (e.g., "today's run"), focus ONLY on that. Use broader data for context only.
+
+REQUIRED SECTIONS:
+
+1. **Current Fitness State** (2-3 sentences max)
+   - CTL/ATL/TSB interpretation + training trend
+
+2. **Workout Analysis** (Focus workouts only - be concise)
+   For each workout:
+   - Stats: duration, distance, type
+   - HR zones: "Z2: 32min, Z4: 8min" (time in each zone)
+   - Purpose: endurance/tempo/intervals?
+   - Key insight: what the data reveals (e.g., "HR drift = poor aerobic base")
+   - 1-2 improvements
+
+3. **Intensity Distribution**
+   - Zone breakdown (% or time)
+   - Polarization: 80/20 rule compliance?
+   - Missing zones?
+
+4. **Next Workouts** (Be VERY specific)
+   - Type: "90min easy run"
+   - HR targets: "60min Z2 (130-145bpm), 20min Z3 (145-155bpm)"
+   - Focus: "Nasal breathing in Z2"
+   - Avoid: "No Z4+ for 3 days"
+   - WHY: Brief rationale (e.g., "builds mitochondrial density")
+
+5. **7-Day Plan** (if general query)
+   - Day-by-day: Recovery/Hard/Specific session
+   - Brief (e.g., "Mon: 60min Z2 run, Tue: Rest, Wed: 4x5min Z4")
+
+WRITING RULES:
+- Short sentences. No fluff.
+- Use numbers and data
+- Reference dates/workouts specifically
+- Give exact HR/pace targets
+- Explain WHY concisely
+- No verbose introductions/summaries
+
+METRICS:
+CTL=fitness(42d), ATL=fatigue(7d), TSB=form, Z2=base, Z4=threshold, Ramp>8=risky
+"""
+
+# Narrow scopes answer one workout's worth of questions; the 7-day plan
+# section only applies to general queries, so it is stripped from their
+# system prompt to save input and output tokens alike
+_SYSTEM_PROMPT_NARROW = _SYSTEM_PROMPT[:_SYSTEM_PROMPT.index('5. **7-Day Plan**')] + \
+    _SYSTEM_PROMPT[_SYSTEM_PROMPT.index('WRITING RULES:'):]
+
+_USER_PROMPT_TMPL = """{context}
+
+## User Question
+{query}
+
+Provide detailed, specific coaching analysis. Be concise but complete. Use short sentences and bullet points."""
+
+_NARROW_LENGTH_HINT = "\n\nRespond in 250 words or fewer."
+
+# Abbreviated key -> activity field for the compact JSON context; the
+# legend below decodes them for the model
+_COMPACT_ACTIVITY_FIELDS = (
+    ('n', 'name'),
+    ('t', 'type'),
+    ('d', 'distance'),
+    ('mt', 'moving_time'),
+    ('hr', 'average_heartrate'),
+    ('mhr', 'max_heartrate'),
+    ('tl', 'icu_training_load'),
+    ('w', 'average_watts'),
+    ('el', 'total_elevation_gain'),
+    ('zt', 'icu_hr_zone_times'),
+    ('if', 'icu_intensity'),
+    ('rpe', 'perceived_exertion'),
+)
+
+_COMPACT_LEGEND = (
+    "Training data as JSON. Key legend: n=name, t=type, dt=date, "
+    "d=distance (m), mt=moving time (s), hr=avg HR, mhr=max HR, "
+    "tl=training load, w=avg watts, el=elevation gain (m), "
+    "zt=seconds per HR zone Z1-Z7, if=intensity factor, rpe=RPE."
+)
+
+# Scopes that pin the analysis to at most one day's activities
+_SINGLE_ACTIVITY_SCOPES = frozenset([
+    'today', 'today_run', 'today_ride', 'today_workout', 'today_swim',
+    'yesterday', 'yesterday_run', 'yesterday_ride', 'latest'
+])
+
+# Queries asking for training plans need the full model even when the
+# scope is narrow
+_PLAN_RE = re.compile(r'\b(?:plan|program|periodi[sz])')
+
+# HR zone labels, shared by every format_hr_zones call
+_ZONE_NAMES = ("Z1", "Z2", "Z3", "Z4", "Z5", "Z6", "Z7")
+
+# Model-name substrings that indicate a reasoning model
+_REASONING_KEYWORDS = (
+    'o1', 'o3', 'deepseek-r1', 'qwq', 'gemini-2.0-flash-thinking',
+    'gemini-2.5-pro', 'reasoning'
+)
+
+# Query-classification keywords and patterns, compiled once at import.
+# Phrases are matched as substrings of the lowercased query to keep the
+# loose matching ("todays run", "how's today?") the CLI has always had.
+_TODAY_WORDS = ('today', 'todays', "today's")
+_LATEST_WORDS = ('latest', 'most recent', 'last workout', 'last run', 'last ride')
+_RIDE_WORDS = ('ride', 'bike', 'cycle')
+_LAST_N_RE = re.compile(r'last (\d+)')
+_COUNT_RE = re.compile(r'\b(?:how many|count)\b')
+_TOTAL_RE = re.compile(r'\btotal (?:distance|time)\b')
+# Count questions only short-circuit when they're counting activities;
+# "how many rest days should I take?" must still reach the LLM
+_ACTIVITY_NOUN_RE = re.compile(
+    r'\b(?:runs?|rides?|bikes?|cycles?|cycling|swims?|workouts?|sessions?|activit)'
+)
+
+# Metric-lookup phrases mapped to the activity field they read. When a
+# query matches one of these and the scope resolves to a single
+# activity, the answer is a plain lookup - no LLM needed.
+_METRIC_WORDS = {
+    'distance': 'distance',
+    'how far': 'distance',
+    'how long': 'moving_time',
+    'duration': 'moving_time',
+    'avg hr': 'average_heartrate',
+    'average hr': 'average_heartrate',
+    'heart rate': 'average_heartrate',
+    'pace': 'pace',
+}
+
+# Value formatters keyed by exact type - one dict lookup instead of an
+# isinstance ladder on a helper called hundreds of times per prompt
+_FORMAT_DISPATCH = {
+    float: lambda v: f"{v:.2f}",
+    list: lambda v: ", ".join(str(item) for item in v),
+}
+
+# Wellness-entry keys that aren't metrics
+_WELLNESS_SKIP = frozenset({'id'})
+
+# Filler words stripped before hashing a query for the response cache,
+# so rephrasings like "How's my training this month?" and "How is
+# training going this month?" map to the same entry
+_QUERY_FILLER_WORDS = frozenset((
+    'a', 'an', 'the', 'my', 'me', 'i', 'is', 'are', 'was', 'it',
+    'please', 'hows', 'going', 'doing', 's'
+))
+_QUERY_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def _normalize_query(query: str) -> str:
+    """
+    Reduce a query to its meaningful lowercase words, in order.
+
+    Word order is preserved - "run before ride" and "ride before run"
+    are different questions and must not share a cache entry.
+    """
+    return ' '.join(
+        token for token in _QUERY_TOKEN_RE.findall(query.lower())
+        if token not in _QUERY_FILLER_WORDS
+    )
+
+
+# Batched questions share one context prefill; past ~6 per call answer
+# quality starts to degrade
+_MAX_BATCH_QUERIES = 6
+_BATCH_ANSWER_RE = re.compile(r'(?ms)^A(\d+):\s*(.*?)(?=^A\d+:|\Z)')
+
+
+def _first(d: Dict, *keys) -> Any:
+    """
+    Return the first non-None value among the given keys.
+
+    intervals.icu exposes most profile metrics under both an icu_-prefixed
+    and a plain key; this resolves the aliasing in one pass instead of a
+    per-metric in/elif ladder.
+    """
+    return next((d[k] for k in keys if d.get(k) is not None), None)
+
+
+def _activity_columns(activities: list) -> Dict[str, list]:
+    """
+    Extract the aggregation fields from a list of activity dicts into
+    parallel (columnar) lists in a single pass.
+
+    Aggregations only touch a handful of numeric fields, so scanning
+    compact lists beats pulling each full activity dict through the
+    cache once per metric.
+    """
+    types = []
+    distances = []
+    moving_times = []
+    loads = []
+    heartrates = []
+
+    for a in activities:
+        get = a.get
+        types.append(get('type', 'Unknown'))
+        distances.append(get('distance') or 0)
+        moving_times.append(get('moving_time') or 0)
+        loads.append(get('icu_training_load') or 0)
+        heartrates.append(get('average_heartrate'))
+
+    return {
+        'type': types,
+        'distance': distances,
+        'moving_time': moving_times,
+        'icu_training_load': loads,
+        'average_heartrate': heartrates,
+    }
+
+
+def _field(keys, label: str, fmt: Callable) -> Callable:
+    """
+    Build a spec row for an activity field.
+
+    keys is a single key or a tuple of fallback keys (first truthy
+    wins, matching the old 'get(a) or get(b)' chains). The returned
+    emitter takes (analyzer, activity.get) and renders
+    '   - Label: value' when a value is present.
+    """
+    if isinstance(keys, str):
+        keys = (keys,)
+
+    def emit(analyzer, get):
+        for key in keys:
+            value = get(key)
+            if value:
+                return f"   - {label}: {fmt(analyzer, value)}\n"
+        return None
+    return emit
+
+
+def _emit_elapsed(analyzer, get):
+    elapsed_time = get('elapsed_time')
+    moving_time = get('moving_time')
+    if elapsed_time and moving_time and elapsed_time > moving_time:
+        return f"   - Elapsed Time: {analyzer.format_duration(elapsed_time)}\n"
+    return None
+
+
+def _emit_heartrate(analyzer, get):
+    avg_hr = get('average_heartrate')
+    if not avg_hr:
+        return None
+    max_hr = get('max_heartrate')
+    if max_hr:
+        return f"   - Avg HR: {avg_hr:.0f} bpm (Max: {max_hr:.0f} bpm)\n"
+    return f"   - Avg HR: {avg_hr:.0f} bpm\n"
+
+
+def _emit_power(analyzer, get):
+    avg_watts = get('average_watts') or get('icu_average_watts')
+    if not avg_watts:
+        return None
+    weighted_watts = get('icu_weighted_avg_watts')
+    if weighted_watts:
+        return f"   - Avg Power: {avg_watts:.0f} watts (Normalized: {weighted_watts:.0f} watts)\n"
+    return f"   - Avg Power: {avg_watts:.0f} watts\n"
+
+
+def _emit_weather(analyzer, get):
+    if not get('has_weather'):
+        return None
+    weather_temp = get('average_weather_temp')
+    wind_speed = get('average_wind_speed')
+    if not (weather_temp or wind_speed):
+        return None
+    pieces = ["   - Weather: "]
+    if weather_temp:
+        pieces.append(f"Temp: {weather_temp:.1f}°C")
+    if wind_speed:
+        pieces.append(f" Wind: {wind_speed:.1f} m/s")
+    pieces.append("\n")
+    return "".join(pieces)
+
+
+def _emit_fitness(analyzer, get):
+    ctl = get('icu_ctl')
+    atl = get('icu_atl')
+    if not (ctl and atl):
+        return None
+    tsb = ctl - atl
+    line = f"   - Fitness/Fatigue after: CTL={ctl:.1f}, ATL={atl:.1f}, TSB={tsb:+.1f}"
+    ramp = get('icu_ramp_rate', 0)
+    if ramp:
+        line += f", Ramp={ramp:+.1f}"
+    return line + "\n"
+
+
+def _emit_w_prime(analyzer, get):
+    w_prime_used = get('icu_w_prime')
+    if not w_prime_used:
+        return None
+    w_prime_max = get('icu_pm_w_prime') or get('icu_rolling_w_prime')
+    if not w_prime_max:
+        return None
+    w_prime_pct = (w_prime_used / w_prime_max) * 100
+    return f"   - W' Used: {w_prime_used:.0f}J / {w_prime_max:.0f}J ({w_prime_pct:.1f}%)\n"
+
+
+# The per-activity detail block, as a flat emitter table built once per
+# process instead of ~40 inline if-blocks re-evaluated per activity.
+# Order matches the original hand-written section; composite fields
+# (HR+max, power+normalized, weather, fitness, W') keep dedicated
+# emitters, everything else goes through _field.
+_ACTIVITY_FIELD_SPEC = (
+    _field(('distance', 'icu_distance'), 'Distance', lambda a, v: a.format_distance(v)),
+    _field('moving_time', 'Duration', lambda a, v: a.format_duration(v)),
+    _emit_elapsed,
+    _emit_heartrate,
+    _field('icu_hr_zone_times', 'HR Zones', lambda a, v: a.format_hr_zones(v)),
+    _emit_power,
+    _field('icu_ftp', 'FTP at time', lambda a, v: f"{v:.0f} watts"),
+    _field('icu_intensity', 'Intensity Factor', lambda a, v: f"{v:.2f}"),
+    _field('pace', 'Pace', lambda a, v: a.format_value(v)),
+    _field('average_speed', 'Avg Speed', lambda a, v: f"{v:.2f} m/s"),
+    _field('average_cadence', 'Avg Cadence', lambda a, v: f"{v:.0f}"),
+    _field('total_elevation_gain', 'Elevation Gain', lambda a, v: f"{v:.0f} m"),
+    _field('icu_training_load', 'Training Load', lambda a, v: f"{v:.0f}"),
+    _field('trimp', 'TRIMP', lambda a, v: f"{v:.0f}"),
+    _field('icu_efficiency_factor', 'Efficiency Factor', lambda a, v: f"{v:.2f}"),
+    _field('decoupling', 'Aerobic Decoupling', lambda a, v: f"{v:.1f}%"),
+    _field('icu_power_hr_z2', 'Power/HR Z2', lambda a, v: f"{v:.2f}"),
+    _field('interval_summary', 'Intervals', lambda a, v: ", ".join(v)),
+    _field('feel', 'Feel', lambda a, v: v),
+    _field('perceived_exertion', 'RPE', lambda a, v: v),
+    _field('session_rpe', 'Session RPE', lambda a, v: v),
+    _field('calories', 'Calories', lambda a, v: f"{v:.0f}"),
+    _emit_weather,
+    _field('device_name', 'Device', lambda a, v: v),
+    _field('power_meter', 'Power Meter', lambda a, v: v),
+    _emit_fitness,
+    _field('polarization_index', 'Polarization Index', lambda a, v: f"{v:.2f}"),
+    _field('icu_variability_index', 'Variability Index', lambda a, v: f"{v:.2f}"),
+    _emit_w_prime,
+    _field('icu_joules', 'Total Work', lambda a, v: f"{v:.0f} kJ"),
+    _field('icu_joules_above_ftp', 'Work Above FTP', lambda a, v: f"{v:.0f} kJ"),
+)
+
+
+# Completed analyses keyed by a hash of (model, prompts). The prompts
+# embed the date range and activity data, so stale data can't produce a
+# hit; repeating an identical question in-process skips the round-trip.
+_RESPONSE_CACHE: Dict[str, str] = {}
+_RESPONSE_CACHE_MAX = 32
+
+# Formatted prompt contexts keyed by a hash of the input data, so
+# asking several questions against the same fetch skips rebuilding the
+# multi-KB context each time
+_FORMAT_CACHE: Dict[bytes, str] = {}
+_FORMAT_CACHE_MAX = 8
+
+
+def _data_key(data: Dict) -> bytes:
+    """
+    Stable digest of a training-data dict for the format cache.
+
+    orjson serializes several times faster than stdlib json and returns
+    bytes that feed blake2b directly; the raw 16-byte digest (rather
+    than hex) keeps the dict keys short.
+    """
+    serialized = orjson.dumps(data, option=orjson.OPT_SORT_KEYS, default=str)
+    return hashlib.blake2b(serialized, digest_size=16).digest()
+
+
+@functools.lru_cache(maxsize=4)
+def _get_openai(api_key: str) -> OpenAI:
+    """
+    Build (or reuse) the OpenRouter client for a given API key.
+
+    The OpenAI client owns an httpx connection pool; sharing one per
+    process lets repeated analyses reuse its warm connections instead of
+    rebuilding the pool per LLMAnalyzer.
+    """
+    return OpenAI(
+        base_url="https://openrouter.ai/api/v1",
+        api_key=api_key
+    )
+
+
+@functools.lru_cache(maxsize=4)
+def _get_async_openai(api_key: str) -> AsyncOpenAI:
+    """Build (or reuse) the async OpenRouter client for a given API key."""
+    return AsyncOpenAI(
+        base_url="https://openrouter.ai/api/v1",
+        api_key=api_key
+    )
+
 
 class LLMAnalyzer:
     """Analyzes workout data using LLM via OpenRouter."""
 
-    def __init__(self, api_key: str, model: str):
-        self.client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key
-        )
+    def __init__(self, api_key: str, model: str, fast_model: Optional[str] = None):
+        self.api_key = api_key
+        self.client = _get_openai(api_key)
         self.model = model
+        # Cheaper model for narrow single-activity questions; defaults
+        # to the main model, so routing is a no-op unless configured
+        self.fast_model = fast_model or Config.OPENROUTER_FAST_MODEL or model
 
         # Detect if this is a reasoning model
-        self.is_reasoning_model = any(keyword in model.lower() for keyword in [
-            'o1', 'o3', 'deepseek-r1', 'qwq', 'gemini-2.0-flash-thinking',
-            'gemini-2.5-pro', 'reasoning'
-        ])
+        model_lower = model.lower()
+        self.is_reasoning_model = any(
+            keyword in model_lower for keyword in _REASONING_KEYWORDS
+        )
+
+        # Which token-limit parameter the model takes is a static
+        # capability - decide it once here instead of discovering it via
+        # a failed call and a second round-trip. The o-family reasoning
+        # models require max_completion_tokens; everything else still
+        # accepts max_tokens, which OpenRouter maps for newer models.
+        self._token_kw = (
+            'max_completion_tokens' if self.is_reasoning_model else 'max_tokens'
+        )
 
     def format_value(self, value: Any) -> str:
         """Format a value for display, handling None values."""
         if value is None:
             return "N/A"
-        if isinstance(value, float):
-            return f"{value:.2f}"
-        if isinstance(value, list):
-            return ", ".join(str(v) for v in value)
-        return str(value)
+        return _FORMAT_DISPATCH.get(type(value), str)(value)
 
     def format_duration(self, seconds: Optional[int]) -> str:
         """Format seconds into human readable duration."""
         if seconds is None:
             return "N/A"
-        hours = seconds // 3600
-        minutes = (seconds % 3600) // 60
-        secs = seconds % 60
-        if hours > 0:
+        # divmod computes quotient and remainder in one pass, halving
+        # the integer ops of the separate // and % version
+        minutes, secs = divmod(seconds, 60)
+        hours, minutes = divmod(minutes, 60)
+        if hours:
             return f"{hours}h {minutes}m {secs}s"
-        elif minutes > 0:
+        if minutes:
             return f"{minutes}m {secs}s"
-        else:
-            return f"{secs}s"
+        return f"{secs}s"
 
     def format_distance(self, meters: Optional[float]) -> str:
         """Format meters into km."""
@@ -50,16 +461,29 @@ class LLMAnalyzer:
             return "N/A"
         return f"{meters / 1000:.2f} km"
 
+    def _format_short(self, seconds) -> str:
+        """
+        Compact duration for zone tables: whole minutes under an hour.
+
+        Zone times are almost always sub-hour, so this skips the
+        hours/minutes/seconds arithmetic of format_duration and renders
+        "32m" instead of "32m 10s" - tighter in the prompt too.
+        """
+        if seconds < 60:
+            return f"{seconds:.0f}s"
+        if seconds < 3600:
+            return f"{seconds // 60:.0f}m"
+        return self.format_duration(seconds)
+
     def format_hr_zones(self, zone_times: Optional[list]) -> str:
         """Format time in HR zones."""
         if not zone_times:
             return "N/A"
-        zones = []
-        zone_names = ["Z1", "Z2", "Z3", "Z4", "Z5", "Z6", "Z7"]
-        for i, time_secs in enumerate(zone_times):
-            if time_secs and time_secs > 0:
-                zones.append(f"{zone_names[i]}: {self.format_duration(time_secs)}")
-        return " | ".join(zones) if zones else "N/A"
+        return " | ".join(
+            f"{name}: {self._format_short(time_secs)}"
+            for name, time_secs in zip(_ZONE_NAMES, zone_times)
+            if time_secs and time_secs > 0
+        ) or "N/A"
 
     def format_training_data(self, data: Dict) -> str:
         """
@@ -71,15 +495,50 @@ class LLMAnalyzer:
         Returns:
             Formatted string for LLM analysis
         """
+        # Same data (including scope) formats to the same context;
+        # repeat questions against one fetch skip the whole walk
+        cache_key = _data_key(data)
+        cached = _FORMAT_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
         profile = data['profile']
         activities = data['activities']
         wellness = data['wellness']
         fitness_trends = data.get('fitness_trends', [])
         date_range = data['date_range']
         query_scope = data.get('query_scope', 'all activities')
+        scope = data.get('scope', 'all')
+
+        # New athletes (and empty fixtures) have nothing to walk - skip
+        # the aggregation and per-activity machinery entirely
+        if not activities and not wellness:
+            return (
+                f"# Training Data Analysis Context\n\n"
+                f"## Analysis Scope\n"
+                f"FOCUS: User is asking about **{query_scope}**\n"
+                f"Data available: {date_range['start']} to {date_range['end']}"
+                f" ({date_range['days']} days)\n"
+                f"Activities in focus: 0\n\n"
+                f"## Athlete Profile\n"
+                f"- Athlete ID: {profile.get('id')}\n"
+                f"- Name: {profile.get('name', 'N/A')}\n\n"
+                f"## Activities Summary\n"
+                f"Total activities in period: 0\n"
+            )
+
+        # Narrow scopes (single day / single activity) don't need the
+        # period-wide trend table - pruning it keeps prompts small for
+        # focused questions
+        narrow_scope = scope.startswith(('today', 'yesterday', 'latest'))
 
-        # Build the context string
-        context = f"""# Training Data Analysis Context
+        # Only emit sport thresholds relevant to the activities in focus
+        focus_types = {(a.get('type') or '').lower() for a in activities}
+        has_ride = not activities or any('ride' in t or 'bike' in t for t in focus_types)
+        has_run = not activities or any('run' in t for t in focus_types)
+
+        # Build the prompt as a list of parts; joined once at the end
+        parts = [f"""# Training Data Analysis Context
 
 ## Analysis Scope
 FOCUS: User is asking about **{query_scope}**
@@ -87,62 +546,59 @@ Data available: {date_range['start']} to {date_range['end']} ({date_range['days'
 Activities in focus: {len(activities)}
 
 ## Athlete Profile
-"""
+"""]
 
         # Athlete basic info
-        context += f"- Athlete ID: {profile.get('id')}\n"
-        context += f"- Name: {profile.get('name', 'N/A')}\n"
-        context += f"- Sex: {profile.get('sex', 'N/A')}\n"
+        parts.append(f"- Athlete ID: {profile.get('id')}\n")
+        parts.append(f"- Name: {profile.get('name', 'N/A')}\n")
+        parts.append(f"- Sex: {profile.get('sex', 'N/A')}\n")
 
         # Physical metrics
-        context += f"\n### Physical Metrics\n"
-        context += f"- Weight: {self.format_value(profile.get('icu_weight'))} kg\n"
-        context += f"- Resting HR: {self.format_value(profile.get('icu_resting_hr'))} bpm\n"
+        parts.append(f"\n### Physical Metrics\n")
+        parts.append(f"- Weight: {self.format_value(profile.get('icu_weight'))} kg\n")
+        parts.append(f"- Resting HR: {self.format_value(profile.get('icu_resting_hr'))} bpm\n")
         if profile.get('icu_date_of_birth'):
-            context += f"- DOB: {profile.get('icu_date_of_birth')}\n"
+            parts.append(f"- DOB: {profile.get('icu_date_of_birth')}\n")
 
-        # Current fitness metrics
-        context += f"\n### Current Fitness Metrics (Latest)\n"
-        if 'icu_ctl' in profile:
-            context += f"- Fitness (CTL): {self.format_value(profile.get('icu_ctl'))}\n"
-        elif 'ctl' in profile:
-            context += f"- Fitness (CTL): {self.format_value(profile.get('ctl'))}\n"
+        # Current fitness metrics; icu_/plain key aliasing is resolved
+        # once per metric via _first
+        parts.append(f"\n### Current Fitness Metrics (Latest)\n")
+        ctl = _first(profile, 'icu_ctl', 'ctl')
+        if ctl is not None:
+            parts.append(f"- Fitness (CTL): {self.format_value(ctl)}\n")
 
-        if 'icu_atl' in profile:
-            context += f"- Fatigue (ATL): {self.format_value(profile.get('icu_atl'))}\n"
-        elif 'atl' in profile:
-            context += f"- Fatigue (ATL): {self.format_value(profile.get('atl'))}\n"
+        atl = _first(profile, 'icu_atl', 'atl')
+        if atl is not None:
+            parts.append(f"- Fatigue (ATL): {self.format_value(atl)}\n")
 
         # Calculate TSB from CTL/ATL
-        ctl = profile.get('icu_ctl') or profile.get('ctl')
-        atl = profile.get('icu_atl') or profile.get('atl')
         if ctl and atl:
             tsb = ctl - atl
-            context += f"- Form (TSB): {tsb:+.1f}\n"
+            parts.append(f"- Form (TSB): {tsb:+.1f}\n")
 
         # Sport-specific thresholds
-        context += f"\n### Performance Thresholds\n"
-        if 'icu_ftp' in profile and profile.get('icu_ftp'):
-            context += f"- Cycling FTP: {self.format_value(profile.get('icu_ftp'))} watts\n"
-        elif 'ftp' in profile and profile.get('ftp'):
-            context += f"- Cycling FTP: {self.format_value(profile.get('ftp'))} watts\n"
-
-        if 'icu_ftp_watts_per_kg' in profile and profile.get('icu_ftp_watts_per_kg'):
-            context += f"- FTP per kg: {self.format_value(profile.get('icu_ftp_watts_per_kg'))} w/kg\n"
-
-        if 'icu_pace' in profile and profile.get('icu_pace'):
-            context += f"- Running Threshold Pace: {self.format_value(profile.get('icu_pace'))}\n"
-        elif 'pace' in profile and profile.get('pace'):
-            context += f"- Running Threshold Pace: {self.format_value(profile.get('pace'))}\n"
-
-        if 'icu_lthr' in profile and profile.get('icu_lthr'):
-            context += f"- Lactate Threshold HR: {self.format_value(profile.get('icu_lthr'))} bpm\n"
-        elif 'lthr' in profile and profile.get('lthr'):
-            context += f"- Lactate Threshold HR: {self.format_value(profile.get('lthr'))} bpm\n"
-
-        # Fitness trends over time (if available)
-        if fitness_trends and len(fitness_trends) > 0:
-            context += f"\n### Fitness Trend (CTL/ATL/TSB over period)\n"
+        parts.append(f"\n### Performance Thresholds\n")
+        if has_ride:
+            ftp = _first(profile, 'icu_ftp', 'ftp')
+            if ftp:
+                parts.append(f"- Cycling FTP: {self.format_value(ftp)} watts\n")
+
+            ftp_per_kg = profile.get('icu_ftp_watts_per_kg')
+            if ftp_per_kg:
+                parts.append(f"- FTP per kg: {self.format_value(ftp_per_kg)} w/kg\n")
+
+        if has_run:
+            pace = _first(profile, 'icu_pace', 'pace')
+            if pace:
+                parts.append(f"- Running Threshold Pace: {self.format_value(pace)}\n")
+
+        lthr = _first(profile, 'icu_lthr', 'lthr')
+        if lthr:
+            parts.append(f"- Lactate Threshold HR: {self.format_value(lthr)} bpm\n")
+
+        # Fitness trends over time (if available and scope is broad)
+        if fitness_trends and len(fitness_trends) > 0 and not narrow_scope:
+            parts.append(f"\n### Fitness Trend (CTL/ATL/TSB over period)\n")
             # Show weekly snapshots
             weekly = [fitness_trends[i] for i in range(0, len(fitness_trends), 7)][-8:]  # Last 8 weeks
             for entry in weekly:
@@ -150,225 +606,143 @@ Activities in focus: {len(activities)}
                 ctl_val = entry.get('ctl', 0)
                 atl_val = entry.get('atl', 0)
                 tsb_val = ctl_val - atl_val if ctl_val and atl_val else 0
-                context += f"- {date}: CTL={ctl_val:.1f}, ATL={atl_val:.1f}, TSB={tsb_val:+.1f}\n"
+                parts.append(f"- {date}: CTL={ctl_val:.1f}, ATL={atl_val:.1f}, TSB={tsb_val:+.1f}\n")
 
         # Activity summary
-        context += f"\n## Activities Summary\n"
-        context += f"Total activities in period: {len(activities)}\n\n"
+        parts.append(f"\n## Activities Summary\n")
+        parts.append(f"Total activities in period: {len(activities)}\n\n")
 
         if activities:
-            # Group by type
-            activity_types = {}
-            for activity in activities:
-                act_type = activity.get('type', 'Unknown')
-                if act_type not in activity_types:
-                    activity_types[act_type] = []
-                activity_types[act_type].append(activity)
-
-            context += "### Activities by Type:\n"
-            for act_type, acts in activity_types.items():
-                total_distance = sum(a.get('distance', 0) or 0 for a in acts) / 1000
-                total_time = sum(a.get('moving_time', 0) or 0 for a in acts) / 3600
-                total_load = sum(a.get('icu_training_load', 0) or 0 for a in acts)
-                context += f"- {act_type}: {len(acts)} activities | "
+            # Extract the aggregation columns once, then accumulate
+            # count/distance/time/load per type from the compact lists
+            cols = _activity_columns(activities)
+            agg = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+            for act_type, distance, moving_time, load in zip(
+                cols['type'], cols['distance'],
+                cols['moving_time'], cols['icu_training_load']
+            ):
+                row = agg[act_type]
+                row[0] += 1
+                row[1] += distance
+                row[2] += moving_time
+                row[3] += load
+
+            parts.append("### Activities by Type:\n")
+            for act_type, (count, distance, moving_time, total_load) in agg.items():
+                total_distance = distance / 1000
+                total_time = moving_time / 3600
+                parts.append(f"- {act_type}: {count} activities | ")
                 if total_distance > 0:
-                    context += f"{total_distance:.1f} km | "
-                context += f"{total_time:.1f} hrs | Load: {total_load:.0f}\n"
+                    parts.append(f"{total_distance:.1f} km | ")
+                parts.append(f"{total_time:.1f} hrs | Load: {total_load:.0f}\n")
 
             # Detailed activity list - limit to 10 most recent with key metrics only
-            context += "\n### Recent Activities (Last 10):\n"
-            for i, activity in enumerate(activities[:10], 1):  # Limit to 10 most recent
-                name = activity.get('name', 'Unnamed')
-                act_type = activity.get('type', 'Unknown')
-                date = activity.get('start_date_local', 'Unknown date')[:10]
-
-                context += f"\n**{i}. {name}** ({act_type}) - {date}\n"
-
-                # Basic metrics
-                distance = activity.get('distance') or activity.get('icu_distance')
-                if distance:
-                    context += f"   - Distance: {self.format_distance(distance)}\n"
-
-                moving_time = activity.get('moving_time')
-                if moving_time:
-                    context += f"   - Duration: {self.format_duration(moving_time)}\n"
-
-                elapsed_time = activity.get('elapsed_time')
-                if elapsed_time and moving_time and elapsed_time > moving_time:
-                    context += f"   - Elapsed Time: {self.format_duration(elapsed_time)}\n"
-
-                # Heart rate metrics
-                avg_hr = activity.get('average_heartrate')
-                max_hr = activity.get('max_heartrate')
-                if avg_hr:
-                    context += f"   - Avg HR: {avg_hr:.0f} bpm"
-                    if max_hr:
-                        context += f" (Max: {max_hr:.0f} bpm)"
-                    context += "\n"
-
-                # HR zones
-                hr_zone_times = activity.get('icu_hr_zone_times')
-                if hr_zone_times:
-                    context += f"   - HR Zones: {self.format_hr_zones(hr_zone_times)}\n"
-
-                # Power metrics
-                avg_watts = activity.get('average_watts') or activity.get('icu_average_watts')
-                weighted_watts = activity.get('icu_weighted_avg_watts')
-                if avg_watts:
-                    context += f"   - Avg Power: {avg_watts:.0f} watts"
-                    if weighted_watts:
-                        context += f" (Normalized: {weighted_watts:.0f} watts)"
-                    context += "\n"
-
-                # FTP and intensity
-                activity_ftp = activity.get('icu_ftp')
-                if activity_ftp:
-                    context += f"   - FTP at time: {activity_ftp:.0f} watts\n"
-
-                intensity = activity.get('icu_intensity')
-                if intensity:
-                    context += f"   - Intensity Factor: {intensity:.2f}\n"
-
-                # Pace metrics
-                pace = activity.get('pace')
-                if pace:
-                    context += f"   - Pace: {self.format_value(pace)}\n"
-
-                avg_speed = activity.get('average_speed')
-                if avg_speed:
-                    context += f"   - Avg Speed: {avg_speed:.2f} m/s\n"
-
-                # Cadence
-                avg_cadence = activity.get('average_cadence')
-                if avg_cadence and avg_cadence > 0:
-                    context += f"   - Avg Cadence: {avg_cadence:.0f}\n"
-
-                # Elevation
-                elevation_gain = activity.get('total_elevation_gain')
-                if elevation_gain:
-                    context += f"   - Elevation Gain: {elevation_gain:.0f} m\n"
-
-                # Training load
-                training_load = activity.get('icu_training_load')
-                if training_load:
-                    context += f"   - Training Load: {training_load:.0f}\n"
-
-                trimp = activity.get('trimp')
-                if trimp:
-                    context += f"   - TRIMP: {trimp:.0f}\n"
-
-                # Efficiency metrics
-                efficiency_factor = activity.get('icu_efficiency_factor')
-                if efficiency_factor:
-                    context += f"   - Efficiency Factor: {efficiency_factor:.2f}\n"
-
-                decoupling = activity.get('decoupling')
-                if decoupling:
-                    context += f"   - Aerobic Decoupling: {decoupling:.1f}%\n"
-
-                power_hr_z2 = activity.get('icu_power_hr_z2')
-                if power_hr_z2:
-                    context += f"   - Power/HR Z2: {power_hr_z2:.2f}\n"
-
-                # Intervals
-                interval_summary = activity.get('interval_summary')
-                if interval_summary:
-                    context += f"   - Intervals: {', '.join(interval_summary)}\n"
-
-                # Feel/RPE
-                feel = activity.get('feel')
-                if feel:
-                    context += f"   - Feel: {feel}\n"
-
-                perceived_exertion = activity.get('perceived_exertion')
-                if perceived_exertion:
-                    context += f"   - RPE: {perceived_exertion}\n"
-
-                session_rpe = activity.get('session_rpe')
-                if session_rpe:
-                    context += f"   - Session RPE: {session_rpe}\n"
-
-                # Calories
-                calories = activity.get('calories')
-                if calories:
-                    context += f"   - Calories: {calories:.0f}\n"
-
-                # Weather (if available)
-                if activity.get('has_weather'):
-                    weather_temp = activity.get('average_weather_temp')
-                    wind_speed = activity.get('average_wind_speed')
-                    if weather_temp or wind_speed:
-                        context += f"   - Weather: "
-                        if weather_temp:
-                            context += f"Temp: {weather_temp:.1f}°C"
-                        if wind_speed:
-                            context += f" Wind: {wind_speed:.1f} m/s"
-                        context += "\n"
-
-                # Device
-                device = activity.get('device_name')
-                if device:
-                    context += f"   - Device: {device}\n"
-
-                # Power meter
-                power_meter = activity.get('power_meter')
-                if power_meter:
-                    context += f"   - Power Meter: {power_meter}\n"
-
-                # CTL/ATL/TSB at this point in time
-                ctl = activity.get('icu_ctl')
-                atl = activity.get('icu_atl')
-                if ctl and atl:
-                    tsb = ctl - atl
-                    ramp = activity.get('icu_ramp_rate', 0)
-                    context += f"   - Fitness/Fatigue after: CTL={ctl:.1f}, ATL={atl:.1f}, TSB={tsb:+.1f}"
-                    if ramp:
-                        context += f", Ramp={ramp:+.1f}"
-                    context += "\n"
-
-                # Polarization index (training intensity distribution)
-                polarization = activity.get('polarization_index')
-                if polarization:
-                    context += f"   - Polarization Index: {polarization:.2f}\n"
-
-                # Variability index (for power-based activities)
-                vi = activity.get('icu_variability_index')
-                if vi:
-                    context += f"   - Variability Index: {vi:.2f}\n"
-
-                # W' metrics for cycling
-                w_prime_used = activity.get('icu_w_prime')
-                w_prime_max = activity.get('icu_pm_w_prime') or activity.get('icu_rolling_w_prime')
-                if w_prime_used and w_prime_max:
-                    w_prime_pct = (w_prime_used / w_prime_max) * 100
-                    context += f"   - W' Used: {w_prime_used:.0f}J / {w_prime_max:.0f}J ({w_prime_pct:.1f}%)\n"
-
-                # Joules/Work
-                joules = activity.get('icu_joules')
-                if joules:
-                    context += f"   - Total Work: {joules:.0f} kJ\n"
-
-                joules_above_ftp = activity.get('icu_joules_above_ftp')
-                if joules_above_ftp:
-                    context += f"   - Work Above FTP: {joules_above_ftp:.0f} kJ\n"
-
-        # Add wellness data if available
-        if wellness and len(wellness) > 0:
-            context += f"\n## Wellness Data\n"
-            context += f"Records available: {len(wellness)}\n"
-            context += "\nRecent wellness entries:\n"
-            for i, entry in enumerate(wellness[:7], 1):  # Last 7 days
-                date = entry.get('id', 'Unknown')
-                context += f"{i}. {date}: "
-                metrics = []
-                for key, value in entry.items():
-                    if key != 'id' and value is not None:
-                        metrics.append(f"{key}: {value}")
-                context += ", ".join(metrics) if metrics else "No data"
-                context += "\n"
-
+            parts.append("\n### Recent Activities (Last 10):\n")
+            for i, activity in enumerate(islice(activities, 10), 1):  # Limit to 10 most recent
+                # Bind the bound-method once; the emitter table does 30+
+                # lookups per activity
+                get = activity.get
+
+                parts.append(_ACTIVITY_HEADER_TMPL.format(
+                    i=i,
+                    name=get('name', 'Unnamed'),
+                    type=get('type', 'Unknown'),
+                    date=get('start_date_local', 'Unknown date')[:10]
+                ))
+
+                # One pass over the field spec instead of ~40 inline
+                # if-blocks; emitters return None for absent fields
+                for emit in _ACTIVITY_FIELD_SPEC:
+                    line = emit(self, get)
+                    if line:
+                        parts.append(line)
+
+            # Summarize anything beyond the detailed rows in one pass so
+            # long lookbacks (e.g. --days 365) stay within token budget
+            # instead of emitting hundreds of rows the model will skim
+            older_count = len(activities) - 10
+            if older_count > 0:
+                # Reuse the columns extracted above rather than walking
+                # the activity dicts a second time
+                total_km = sum(cols['distance'][10:]) / 1000
+                total_hours = sum(cols['moving_time'][10:]) / 3600
+                total_load = sum(cols['icu_training_load'][10:])
+                heartrates = [hr for hr in cols['average_heartrate'][10:] if hr]
+
+                parts.append(f"\n### Older Activities ({older_count} more, aggregated):\n")
+                parts.append(f"- Total: {total_km:.1f} km | {total_hours:.1f} hrs | Load: {total_load:.0f}\n")
+                if heartrates:
+                    parts.append(f"- Avg HR across activities: {sum(heartrates) / len(heartrates):.0f} bpm\n")
+
+        # Add wellness data if available; single-activity questions
+        # don't need the 7-day wellness table
+        if wellness and len(wellness) > 0 and not narrow_scope:
+            parts.append(f"\n## Wellness Data\n")
+            parts.append(f"Records available: {len(wellness)}\n")
+            parts.append("\nRecent wellness entries:\n")
+            for i, entry in enumerate(islice(wellness, 7), 1):  # Last 7 days
+                metrics_str = ", ".join(
+                    f"{key}: {value}" for key, value in entry.items()
+                    if key not in _WELLNESS_SKIP and value is not None
+                ) or "No data"
+                parts.append(f"{i}. {entry.get('id', 'Unknown')}: {metrics_str}\n")
+
+        context = "".join(parts)
+        while len(_FORMAT_CACHE) >= _FORMAT_CACHE_MAX:
+            _FORMAT_CACHE.pop(next(iter(_FORMAT_CACHE)))
+        _FORMAT_CACHE[cache_key] = context
         return context
 
+    def format_training_data_compact(self, data: Dict) -> str:
+        """
+        Format training data as compact JSON instead of Markdown.
+
+        The model reads the same facts from a keyed JSON dump at roughly
+        half the input tokens of the Markdown context, which cuts
+        prefill latency and cost proportionally. Enabled with
+        FAST_COMPACT_PROMPT=1; the Markdown path stays the default for
+        models that narrate better from prose.
+        """
+        profile = data['profile']
+        activities = data['activities']
+        wellness = data['wellness']
+        date_range = data['date_range']
+        scope = data.get('scope', 'all')
+        narrow_scope = scope.startswith(('today', 'yesterday', 'latest'))
+
+        ctl = _first(profile, 'icu_ctl', 'ctl')
+        atl = _first(profile, 'icu_atl', 'atl')
+        compact_profile = {
+            'weight_kg': profile.get('icu_weight'),
+            'resting_hr': profile.get('icu_resting_hr'),
+            'ctl': ctl,
+            'atl': atl,
+            'tsb': round(ctl - atl, 1) if ctl and atl else None,
+            'ftp_w': _first(profile, 'icu_ftp', 'ftp'),
+            'lthr': _first(profile, 'icu_lthr', 'lthr'),
+        }
+
+        compact_activities = []
+        for a in activities:
+            get = a.get
+            row = {'dt': (get('start_date_local') or '')[:10]}
+            for short, field in _COMPACT_ACTIVITY_FIELDS:
+                value = get(field)
+                if value is not None:
+                    row[short] = value
+            compact_activities.append(row)
+
+        payload = {
+            'scope': data.get('query_scope', 'all activities'),
+            'range': date_range,
+            'profile': {k: v for k, v in compact_profile.items() if v is not None},
+            'activities': compact_activities,
+        }
+        if wellness and not narrow_scope:
+            payload['wellness'] = wellness[:7]
+
+        return _COMPACT_LEGEND + "\n" + orjson.dumps(payload, default=str).decode()
+
     def filter_activities_by_query(self, activities: list, query: str) -> tuple:
         """
         Filter activities based on user query to focus analysis.
@@ -376,52 +750,59 @@ Activities in focus: {len(activities)}
         Returns:
             (filtered_activities, focus_scope, scope_description)
         """
-        from datetime import datetime, timedelta
-
         query_lower = query.lower()
         today = datetime.now().date()
 
+        # Slice each activity's date key and lowered type out once; every
+        # branch below compares against these lists instead of re-running
+        # .get() + slice/.lower() per activity per branch
+        dates = [a.get('start_date_local', '')[:10] for a in activities]
+        types = [(a.get('type') or '').lower() for a in activities]
+
         # Single activity queries with type filtering
-        if any(word in query_lower for word in ['today', 'todays', "today's"]):
-            today_activities = [a for a in activities if a.get('start_date_local', '')[:10] == today.isoformat()]
+        if any(word in query_lower for word in _TODAY_WORDS):
+            today_iso = today.isoformat()
+            today_pairs = [(a, t) for a, d, t in zip(activities, dates, types)
+                           if d == today_iso]
 
             # Check if specific activity type is mentioned
             if 'run' in query_lower:
-                filtered = [a for a in today_activities if 'run' in a.get('type', '').lower()]
+                filtered = [a for a, t in today_pairs if 'run' in t]
                 return filtered, 'today_run', "today's run"
-            elif 'ride' in query_lower or 'bike' in query_lower or 'cycle' in query_lower:
-                filtered = [a for a in today_activities if 'ride' in a.get('type', '').lower()]
+            elif any(word in query_lower for word in _RIDE_WORDS):
+                filtered = [a for a, t in today_pairs if 'ride' in t]
                 return filtered, 'today_ride', "today's ride"
             elif 'workout' in query_lower:
-                filtered = [a for a in today_activities if 'workout' in a.get('type', '').lower()]
+                filtered = [a for a, t in today_pairs if 'workout' in t]
                 return filtered, 'today_workout', "today's workout"
             elif 'swim' in query_lower:
-                filtered = [a for a in today_activities if 'swim' in a.get('type', '').lower()]
+                filtered = [a for a, t in today_pairs if 'swim' in t]
                 return filtered, 'today_swim', "today's swim"
             else:
-                return today_activities, 'today', "today's activities"
+                return [a for a, _ in today_pairs], 'today', "today's activities"
 
         if 'yesterday' in query_lower:
             yesterday = (today - timedelta(days=1)).isoformat()
-            yesterday_activities = [a for a in activities if a.get('start_date_local', '')[:10] == yesterday]
+            yesterday_pairs = [(a, t) for a, d, t in zip(activities, dates, types)
+                               if d == yesterday]
 
             # Check if specific activity type is mentioned
             if 'run' in query_lower:
-                filtered = [a for a in yesterday_activities if 'run' in a.get('type', '').lower()]
+                filtered = [a for a, t in yesterday_pairs if 'run' in t]
                 return filtered, 'yesterday_run', "yesterday's run"
-            elif 'ride' in query_lower or 'bike' in query_lower or 'cycle' in query_lower:
-                filtered = [a for a in yesterday_activities if 'ride' in a.get('type', '').lower()]
+            elif any(word in query_lower for word in _RIDE_WORDS):
+                filtered = [a for a, t in yesterday_pairs if 'ride' in t]
                 return filtered, 'yesterday_ride', "yesterday's ride"
             else:
-                return yesterday_activities, 'yesterday', "yesterday's activities"
+                return [a for a, _ in yesterday_pairs], 'yesterday', "yesterday's activities"
 
-        if any(word in query_lower for word in ['latest', 'most recent', 'last workout', 'last run', 'last ride']):
+        if any(word in query_lower for word in _LATEST_WORDS):
             # Get the most recent activity of the mentioned type
             if 'run' in query_lower:
-                filtered = [a for a in activities if 'run' in a.get('type', '').lower()][:1]
+                filtered = [a for a, t in zip(activities, types) if 'run' in t][:1]
                 return filtered, 'latest', "latest run"
             elif 'ride' in query_lower:
-                filtered = [a for a in activities if 'ride' in a.get('type', '').lower()][:1]
+                filtered = [a for a, t in zip(activities, types) if 'ride' in t][:1]
                 return filtered, 'latest', "latest ride"
             else:
                 return activities[:1], 'latest', "latest activity"
@@ -429,26 +810,25 @@ Activities in focus: {len(activities)}
         # Time range queries
         if 'this week' in query_lower:
             week_start = (today - timedelta(days=today.weekday())).isoformat()
-            filtered = [a for a in activities if a.get('start_date_local', '')[:10] >= week_start]
+            filtered = [a for a, d in zip(activities, dates) if d >= week_start]
             return filtered, 'week', "this week's activities"
 
         if 'last week' in query_lower:
             week_start = (today - timedelta(days=today.weekday() + 7)).isoformat()
             week_end = (today - timedelta(days=today.weekday() + 1)).isoformat()
-            filtered = [a for a in activities
-                       if week_start <= a.get('start_date_local', '')[:10] <= week_end]
+            filtered = [a for a, d in zip(activities, dates)
+                       if week_start <= d <= week_end]
             return filtered, 'last_week', "last week's activities"
 
         # Count-based queries
-        import re
-        match = re.search(r'last (\d+)', query_lower)
+        match = _LAST_N_RE.search(query_lower)
         if match and not any(word in query_lower for word in ['days', 'weeks', 'months']):
             count = int(match.group(1))
             if 'run' in query_lower:
-                filtered = [a for a in activities if 'run' in a.get('type', '').lower()][:count]
+                filtered = [a for a, t in zip(activities, types) if 'run' in t][:count]
                 return filtered, 'count', f"last {count} runs"
             elif 'ride' in query_lower:
-                filtered = [a for a in activities if 'ride' in a.get('type', '').lower()][:count]
+                filtered = [a for a, t in zip(activities, types) if 'ride' in t][:count]
                 return filtered, 'count', f"last {count} rides"
             else:
                 return activities[:count], 'count', f"last {count} activities"
@@ -456,16 +836,137 @@ Activities in focus: {len(activities)}
         # Default: return all activities for general analysis
         return activities, 'all', "all activities"
 
-    def analyze(self, training_data: Dict, user_query: str) -> str:
+    def _try_fast_path(self, training_data: Dict, user_query: str) -> Optional[str]:
         """
-        Analyze training data based on user's question.
+        Answer trivial count/total queries directly from the data.
 
-        Args:
-            training_data: Dictionary with profile, activities, wellness
-            user_query: User's natural language question
+        Queries like "how many runs this week" or "total distance this
+        month" don't need a multi-second LLM round-trip - the numbers
+        are already in hand. Returns a markdown answer, or None when the
+        query needs real analysis.
+        """
+        query_lower = user_query.lower()
+
+        is_count = (
+            _COUNT_RE.search(query_lower) is not None
+            and _ACTIVITY_NOUN_RE.search(query_lower) is not None
+        )
+        is_total = _TOTAL_RE.search(query_lower) is not None
+        metric_fields = [
+            field for word, field in _METRIC_WORDS.items()
+            if word in query_lower
+        ]
+        if not (is_count or is_total or metric_fields):
+            return None
+
+        # Reuse the scope filtering so "this week" / "last 5 runs" etc.
+        # narrow the data the same way a full analysis would
+        activities, _, scope_desc = self.filter_activities_by_query(
+            training_data['activities'], user_query
+        )
+
+        # Metric lookups only short-circuit when the scope pinned down
+        # exactly one activity; anything broader needs real analysis
+        if metric_fields and not (is_count or is_total):
+            if len(activities) != 1:
+                return None
+            return self._format_metric_answer(
+                activities[0], metric_fields, scope_desc
+            )
+
+        # Narrow by sport when one is named; _RIDE_WORDS covers the
+        # bike/cycle synonyms the Ride type is asked about with
+        if 'run' in query_lower:
+            type_key = 'run'
+        elif any(word in query_lower for word in _RIDE_WORDS):
+            type_key = 'ride'
+        elif 'swim' in query_lower:
+            type_key = 'swim'
+        elif 'workout' in query_lower:
+            type_key = 'workout'
+        else:
+            type_key = None
+
+        if type_key:
+            activities = [
+                a for a in activities
+                if type_key in (a.get('type') or '').lower()
+            ]
+
+        if is_count:
+            return f"**{len(activities)}** activities match ({scope_desc})."
+
+        total_km = sum((a.get('distance') or 0) for a in activities) / 1000
+        total_time = sum((a.get('moving_time') or 0) for a in activities)
+        return (
+            f"**Totals for {scope_desc}:** {total_km:.1f} km, "
+            f"{self.format_duration(total_time)} across {len(activities)} activities."
+        )
+
+    def _format_metric_answer(
+        self, activity: Dict, fields: list, scope_desc: str
+    ) -> Optional[str]:
+        """
+        Render a direct answer for a single-activity metric lookup.
+
+        Returns None when none of the requested metrics are present so
+        the query falls back to the full LLM path.
+        """
+        get = activity.get
+        facts = []
+        for field in fields:
+            value = get(field)
+            if not value:
+                continue
+            if field == 'distance':
+                facts.append(f"distance {self.format_distance(value)}")
+            elif field == 'moving_time':
+                facts.append(f"duration {self.format_duration(value)}")
+            elif field == 'average_heartrate':
+                facts.append(f"avg HR {value:.0f} bpm")
+            else:
+                facts.append(f"{field.replace('_', ' ')} {self.format_value(value)}")
+        if not facts:
+            return None
+
+        name = get('name', 'Unnamed')
+        date = get('start_date_local', '')[:10]
+        return (
+            f"**{name}** ({date}) is {scope_desc}. "
+            f"Key numbers: {', '.join(facts)}."
+        )
+
+    def _system_message(self, narrow: bool = False) -> Dict:
+        """
+        System message, marked for provider-side prompt caching when the
+        model supports it.
+
+        Anthropic models via OpenRouter honor an explicit cache_control
+        marker, letting the provider reuse the KV cache for the static
+        coaching prompt across requests. OpenAI models cache long stable
+        prefixes automatically, so they get the plain string form.
+        Narrow scopes get the variant without the 7-day plan section.
+        """
+        system_prompt = _SYSTEM_PROMPT_NARROW if narrow else _SYSTEM_PROMPT
+        model_lower = self.model.lower()
+        if 'claude' in model_lower or 'anthropic' in model_lower:
+            return {
+                "role": "system",
+                "content": [{
+                    "type": "text",
+                    "text": system_prompt,
+                    "cache_control": {"type": "ephemeral"}
+                }]
+            }
+        return {"role": "system", "content": system_prompt}
+
+    def _build_messages(self, training_data: Dict, user_query: str) -> tuple:
+        """
+        Build the chat messages for a query against the focused data.
 
         Returns:
-            LLM's analysis response
+            (messages, scope) - scope feeds _completion_params so the
+            output-token cap matches how focused the question is
         """
         # Filter activities based on query
         filtered_activities, scope, scope_desc = self.filter_activities_by_query(
@@ -477,111 +978,310 @@ Activities in focus: {len(activities)}
         focused_data = training_data.copy()
         focused_data['activities'] = filtered_activities
         focused_data['query_scope'] = scope_desc
+        focused_data['scope'] = scope
 
         # Format the training data
-        context = self.format_training_data(focused_data)
+        if Config.COMPACT_PROMPT:
+            context = self.format_training_data_compact(focused_data)
+        else:
+            context = self.format_training_data(focused_data)
 
-        # Build the full prompt
-        system_prompt = """You are an expert sports scientist and endurance coach providing detailed, specific training analysis.
+        # Prompts come from module-level templates compiled at import
+        user_prompt = _USER_PROMPT_TMPL.format(context=context, query=user_query)
 
-CRITICAL: Be concise but complete. Use short, direct sentences. Avoid repetition and filler words.
+        narrow = scope in _SINGLE_ACTIVITY_SCOPES
+        if narrow:
+            user_prompt += _NARROW_LENGTH_HINT
 
-IMPORTANT: Check "Analysis Scope" - if user asks about specific workout (e.g., "today's run"), focus ONLY on that. Use broader data for context only.
+        return [
+            self._system_message(narrow=narrow),
+            {"role": "user", "content": user_prompt}
+        ], scope
 
-REQUIRED SECTIONS:
+    def _completion_params(self, scope: str = 'all') -> tuple:
+        """
+        Return (temperature, max_completion_tokens) for the model.
 
-1. **Current Fitness State** (2-3 sentences max)
-   - CTL/ATL/TSB interpretation + training trend
+        Generation time scales roughly linearly with output tokens, so
+        the cap tracks the scope: a single workout doesn't need the full
+        report budget, a weekly review needs about half of it.
+        """
+        if scope in _SINGLE_ACTIVITY_SCOPES:
+            max_tokens = 600
+        elif scope in ('week', 'last_week'):
+            max_tokens = 1200
+        else:
+            max_tokens = 2000
 
-2. **Workout Analysis** (Focus workouts only - be concise)
-   For each workout:
-   - Stats: duration, distance, type
-   - HR zones: "Z2: 32min, Z4: 8min" (time in each zone)
-   - Purpose: endurance/tempo/intervals?
-   - Key insight: what the data reveals (e.g., "HR drift = poor aerobic base")
-   - 1-2 improvements
+        if self.is_reasoning_model:
+            # Reasoning models need higher limits and different
+            # temperature; their hidden thinking eats into the budget
+            return 1.0, max_tokens * 3
+        return 0.7, max_tokens
 
-3. **Intensity Distribution**
-   - Zone breakdown (% or time)
-   - Polarization: 80/20 rule compliance?
-   - Missing zones?
+    def _pick_model(self, scope: str, user_query: str) -> str:
+        """
+        Route the request to the cheaper model when the question is
+        narrow enough that it can't benefit from the heavier one.
 
-4. **Next Workouts** (Be VERY specific)
-   - Type: "90min easy run"
-   - HR targets: "60min Z2 (130-145bpm), 20min Z3 (145-155bpm)"
-   - Focus: "Nasal breathing in Z2"
-   - Avoid: "No Z4+ for 3 days"
-   - WHY: Brief rationale (e.g., "builds mitochondrial density")
+        Single-activity scopes are summaries of a handful of numbers;
+        only plan/program requests need the full model's reasoning.
+        """
+        if (
+            self.fast_model != self.model
+            and scope in _SINGLE_ACTIVITY_SCOPES
+            and not _PLAN_RE.search(user_query.lower())
+        ):
+            return self.fast_model
+        return self.model
+
+    def _cache_key(
+        self,
+        messages: list,
+        model: Optional[str] = None,
+        user_query: Optional[str] = None
+    ) -> str:
+        """
+        Digest of the model and full prompt content.
 
-5. **7-Day Plan** (if general query)
-   - Day-by-day: Recovery/Hard/Specific session
-   - Brief (e.g., "Mon: 60min Z2 run, Tue: Rest, Wed: 4x5min Z4")
+        When user_query is given, its verbatim occurrence in the prompt
+        is replaced by its normalized word sequence before hashing, so
+        near-duplicate phrasings of the same question against the same
+        data hit the same cache entry.
+        """
+        normalized = _normalize_query(user_query) if user_query else None
+        digest = hashlib.blake2b((model or self.model).encode(), digest_size=16)
+        for message in messages:
+            content = message['content']
+            if isinstance(content, str):
+                if normalized is not None:
+                    content = content.replace(user_query, normalized)
+                digest.update(content.encode())
+            else:
+                for block in content:
+                    digest.update(block.get('text', '').encode())
+        return digest.hexdigest()
+
+    @staticmethod
+    def _cache_store(key: str, content: str) -> None:
+        """Remember a completed analysis, evicting oldest entries first."""
+        while len(_RESPONSE_CACHE) >= _RESPONSE_CACHE_MAX:
+            _RESPONSE_CACHE.pop(next(iter(_RESPONSE_CACHE)))
+        _RESPONSE_CACHE[key] = content
+
+    def analyze_stream(self, training_data: Dict, user_query: str):
+        """
+        Analyze training data, yielding the response incrementally.
 
-WRITING RULES:
-- Short sentences. No fluff.
-- Use numbers and data
-- Reference dates/workouts specifically
-- Give exact HR/pace targets
-- Explain WHY concisely
-- No verbose introductions/summaries
+        Generator counterpart to analyze(): yields text deltas as the
+        model produces them so callers can render output immediately.
+        """
+        # Trivial count/total questions are answered locally without an
+        # LLM round-trip
+        fast_answer = self._try_fast_path(training_data, user_query)
+        if fast_answer is not None:
+            yield fast_answer
+            return
+
+        messages, scope = self._build_messages(training_data, user_query)
+        temperature, max_completion_tokens = self._completion_params(scope)
+        model = self._pick_model(scope, user_query)
+
+        cache_key = self._cache_key(messages, model, user_query)
+        cached = _RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+        stream = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            **{self._token_kw: max_completion_tokens}
+        )
 
-METRICS:
-CTL=fitness(42d), ATL=fatigue(7d), TSB=form, Z2=base, Z4=threshold, Ramp>8=risky
-"""
+        pieces = []
+        finish_reason = None
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            if choice.delta and choice.delta.content:
+                pieces.append(choice.delta.content)
+                yield choice.delta.content
+            if choice.finish_reason:
+                finish_reason = choice.finish_reason
+
+        if finish_reason == 'length':
+            truncation_note = "\n\n*[Response was truncated due to length. Try asking a more specific question.]*"
+            pieces.append(truncation_note)
+            yield truncation_note
+
+        self._cache_store(cache_key, "".join(pieces))
+
+    def analyze_batch(self, training_data: Dict, user_queries: list) -> list:
+        """
+        Answer several questions against the same training data in as
+        few LLM calls as possible.
 
-        user_prompt = f"""{context}
+        The formatted context dominates the prompt, so batching N
+        questions into one completion pays its prefill cost once instead
+        of N times. Questions are numbered Q1..Qn and the model is asked
+        to answer with matching A1..An markers, which are parsed back
+        into one response per question.
 
-## User Question
-{user_query}
+        Args:
+            training_data: Dictionary with profile, activities, wellness
+            user_queries: List of natural language questions
 
-Provide detailed, specific coaching analysis. Be concise but complete. Use short sentences and bullet points."""
+        Returns:
+            List of analysis strings, one per query, in order
+        """
+        if not user_queries:
+            return []
+        if len(user_queries) == 1:
+            return [self.analyze(training_data, user_queries[0])]
 
-        # Adjust parameters based on model type
-        if self.is_reasoning_model:
-            # Reasoning models need higher limits and different temperature
-            max_completion_tokens = 6000  # Reduced from 8000 for more concise responses
-            temperature = 1.0  # Reasoning models often work better at 1.0
-            extra_params = {}
-        else:
-            max_completion_tokens = 2000  # Reduced from 2500 for conciseness
-            temperature = 0.7
-            extra_params = {}
+        # Batch against the full context; per-query scope filtering
+        # can't narrow a shared prompt
+        focused_data = training_data.copy()
+        focused_data['query_scope'] = 'multiple questions (see below)'
+        context = self.format_training_data(focused_data)
+
+        temperature, max_completion_tokens = self._completion_params()
+
+        answers = []
+        for start in range(0, len(user_queries), _MAX_BATCH_QUERIES):
+            batch = user_queries[start:start + _MAX_BATCH_QUERIES]
+            numbered = "\n".join(f"Q{i}: {q}" for i, q in enumerate(batch, 1))
+            user_prompt = (
+                f"{context}\n\n## Questions\n"
+                f"Answer each numbered question separately. Prefix each "
+                f"answer with 'A<number>:' on its own line.\n{numbered}"
+            )
 
-        # Call OpenRouter API
-        try:
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": system_prompt},
+                    self._system_message(),
                     {"role": "user", "content": user_prompt}
                 ],
                 temperature=temperature,
-                max_completion_tokens=max_completion_tokens,  # Use max_completion_tokens instead of max_tokens
-                **extra_params
+                **{self._token_kw: max_completion_tokens}
             )
-
-            # Extract content from response
             content = response.choices[0].message.content
 
-            # Check if response was cut off
-            finish_reason = response.choices[0].finish_reason
-            if finish_reason == 'length':
-                content += "\n\n*[Response was truncated due to length. Try asking a more specific question.]*"
-
-            return content
-
-        except Exception as e:
-            # Fallback with max_tokens if max_completion_tokens fails
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": user_prompt}
-                    ],
-                    temperature=temperature,
-                    max_tokens=max_completion_tokens
-                )
-                return response.choices[0].message.content
-            except Exception as fallback_e:
-                raise Exception(f"API Error: {str(e)}, Fallback Error: {str(fallback_e)}")
+            parsed = {
+                int(number): text.strip()
+                for number, text in _BATCH_ANSWER_RE.findall(content)
+            }
+            if parsed:
+                answers.extend(parsed.get(i, '') for i in range(1, len(batch) + 1))
+            else:
+                # Model ignored the marker format; fall back to one
+                # call per question rather than returning garbage
+                answers.extend(self.analyze(training_data, q) for q in batch)
+
+        return answers
+
+    def analyze(
+        self,
+        training_data: Dict,
+        user_query: str,
+        on_delta: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """
+        Analyze training data based on user's question.
+
+        Args:
+            training_data: Dictionary with profile, activities, wellness
+            user_query: User's natural language question
+            on_delta: Optional callback invoked with the accumulated text
+                as streamed tokens arrive; when set, the request streams
+                so the first tokens appear immediately
+
+        Returns:
+            LLM's analysis response
+        """
+        if on_delta is not None:
+            pieces = []
+            for delta in self.analyze_stream(training_data, user_query):
+                pieces.append(delta)
+                on_delta("".join(pieces))
+            return "".join(pieces)
+
+        # Trivial count/total questions are answered locally without an
+        # LLM round-trip
+        fast_answer = self._try_fast_path(training_data, user_query)
+        if fast_answer is not None:
+            return fast_answer
+
+        messages, scope = self._build_messages(training_data, user_query)
+        temperature, max_completion_tokens = self._completion_params(scope)
+        model = self._pick_model(scope, user_query)
+
+        cache_key = self._cache_key(messages, model, user_query)
+        cached = _RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # Call OpenRouter API; the token-limit kwarg was chosen at init,
+        # so errors surface directly instead of triggering a silent
+        # second round-trip with the other parameter name
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            **{self._token_kw: max_completion_tokens}
+        )
+
+        # Extract content from response
+        content = response.choices[0].message.content
+
+        # Check if response was cut off
+        if response.choices[0].finish_reason == 'length':
+            content += "\n\n*[Response was truncated due to length. Try asking a more specific question.]*"
+
+        self._cache_store(cache_key, content)
+        return content
+
+    async def aanalyze(self, training_data: Dict, user_query: str) -> str:
+        """
+        Async counterpart to analyze() for callers already inside an
+        event loop.
+
+        Prompt formatting (which walks every activity dict) runs in the
+        default executor so it overlaps with other pending coroutines,
+        and the completion itself is awaited on the shared AsyncOpenAI
+        client instead of blocking the loop.
+        """
+        fast_answer = self._try_fast_path(training_data, user_query)
+        if fast_answer is not None:
+            return fast_answer
+
+        loop = asyncio.get_running_loop()
+        messages, scope = await loop.run_in_executor(
+            None, self._build_messages, training_data, user_query
+        )
+        temperature, max_completion_tokens = self._completion_params(scope)
+        model = self._pick_model(scope, user_query)
+
+        cache_key = self._cache_key(messages, model, user_query)
+        cached = _RESPONSE_CACHE.get(cache_key)
+        if cached is not None:
+            return cached
+
+        response = await _get_async_openai(self.api_key).chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            **{self._token_kw: max_completion_tokens}
+        )
+
+        content = response.choices[0].message.content
+        if response.choices[0].finish_reason == 'length':
+            content += "\n\n*[Response was truncated due to length. Try asking a more specific question.]*"
+
+        self._cache_store(cache_key, content)
+        return content
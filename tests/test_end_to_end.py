@@ -1,4 +1,5 @@
 """End-to-end integration tests."""
+import json
 import unittest
 from unittest.mock import Mock, patch, MagicMock
 import sys
@@ -7,6 +8,7 @@ import os
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import llm_analyzer
 from query_parser import QueryParser
 from intervals_client import IntervalsClient
 from llm_analyzer import LLMAnalyzer
@@ -15,10 +17,15 @@ from llm_analyzer import LLMAnalyzer
 class TestEndToEnd(unittest.TestCase):
     """End-to-end integration tests."""
 
-    @patch('intervals_client.requests.Session')
+    @patch('intervals_client.requests.Session.get')
     @patch('llm_analyzer.OpenAI')
-    def test_full_analysis_workflow(self, mock_openai, mock_session):
+    def test_full_analysis_workflow(self, mock_openai, mock_get):
         """Test complete workflow from query to analysis."""
+        # The analyzer's OpenAI client is a cached per-key singleton;
+        # clear it so the patched class is actually constructed
+        llm_analyzer._get_openai.cache_clear()
+        self.addCleanup(llm_analyzer._get_openai.cache_clear)
+
         # 1. Parse query
         parser = QueryParser()
         context = parser.parse("How's my training this month?")
@@ -27,22 +34,19 @@ class TestEndToEnd(unittest.TestCase):
         self.assertEqual(context.timeframe, 'month')
 
         # 2. Mock intervals.icu data fetch
-        mock_get = MagicMock()
-        mock_session.return_value.get = mock_get
-
         # Mock profile response
         profile_response = Mock()
-        profile_response.json.return_value = {
+        profile_response.content = json.dumps({
             'id': 'athlete1',
             'icu_weight': 70.0,
             'icu_resting_hr': 60,
             'ctl': 25.0,
             'atl': 20.0
-        }
+        }).encode()
 
         # Mock activities response
         activities_response = Mock()
-        activities_response.json.return_value = [
+        activities_response.content = json.dumps([
             {
                 'id': 'act1',
                 'type': 'Run',
@@ -61,13 +65,25 @@ class TestEndToEnd(unittest.TestCase):
                 'average_heartrate': 140,
                 'icu_training_load': 60
             }
-        ]
+        ]).encode()
 
         # Mock wellness response
         wellness_response = Mock()
-        wellness_response.json.return_value = []
-
-        mock_get.side_effect = [profile_response, activities_response, wellness_response]
+        wellness_response.content = json.dumps([]).encode()
+
+        # Dispatch responses by URL since the fetches run concurrently
+        def get_by_url(url, **kwargs):
+            if 'activities' in url:
+                return activities_response
+            if 'wellness' in url:
+                return wellness_response
+            if 'fitness-trend' in url:
+                trends_response = Mock()
+                trends_response.content = json.dumps([]).encode()
+                return trends_response
+            return profile_response
+
+        mock_get.side_effect = get_by_url
 
         # Fetch data
         client = IntervalsClient('api_key', 'athlete_id')
@@ -96,8 +112,8 @@ class TestEndToEnd(unittest.TestCase):
         self.assertIn("training", analysis.lower())
         mock_client.chat.completions.create.assert_called_once()
 
-    @patch('intervals_client.requests.Session')
-    def test_activity_filtering_workflow(self, mock_session):
+    @patch('intervals_client.requests.Session.get')
+    def test_activity_filtering_workflow(self, mock_get):
         """Test workflow with activity type filtering."""
         # Parse query with activity type
         parser = QueryParser()
@@ -108,27 +124,36 @@ class TestEndToEnd(unittest.TestCase):
         self.assertEqual(context.activity_count, 5)
 
         # Mock data fetch
-        mock_get = MagicMock()
-        mock_session.return_value.get = mock_get
-
         profile_response = Mock()
-        profile_response.json.return_value = {'id': 'athlete1'}
+        profile_response.content = json.dumps({'id': 'athlete1'}).encode()
 
         # Mix of activities
         activities_response = Mock()
-        activities_response.json.return_value = [
+        activities_response.content = json.dumps([
             {'id': 'act1', 'type': 'Run', 'distance': 5000},
             {'id': 'act2', 'type': 'Ride', 'distance': 20000},
             {'id': 'act3', 'type': 'Run', 'distance': 6000},
             {'id': 'act4', 'type': 'Run', 'distance': 5500},
             {'id': 'act5', 'type': 'Workout', 'distance': 0},
             {'id': 'act6', 'type': 'Run', 'distance': 7000},
-        ]
+        ]).encode()
 
         wellness_response = Mock()
-        wellness_response.json.return_value = []
-
-        mock_get.side_effect = [profile_response, activities_response, wellness_response]
+        wellness_response.content = json.dumps([]).encode()
+
+        # Dispatch responses by URL since the fetches run concurrently
+        def get_by_url(url, **kwargs):
+            if 'activities' in url:
+                return activities_response
+            if 'wellness' in url:
+                return wellness_response
+            if 'fitness-trend' in url:
+                trends_response = Mock()
+                trends_response.content = json.dumps([]).encode()
+                return trends_response
+            return profile_response
+
+        mock_get.side_effect = get_by_url
 
         # Fetch and filter
         client = IntervalsClient('api_key', 'athlete_id')
@@ -1,4 +1,5 @@
 """Unit tests for intervals client."""
+import json
 import unittest
 from unittest.mock import Mock, patch, MagicMock
 from datetime import datetime, timedelta
@@ -15,30 +16,34 @@ class TestIntervalsClient(unittest.TestCase):
     """Test cases for IntervalsClient."""
 
     def setUp(self):
-        """Set up test fixtures."""
+        """Set up test fixtures with a shared mocked Session.get."""
+        # One patcher per test instead of a decorator per method; the
+        # mock is fresh each test so call counts stay clean
+        patcher = patch('intervals_client.requests.Session.get')
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
         self.api_key = "test_api_key"
         self.athlete_id = "test_athlete"
         self.client = IntervalsClient(self.api_key, self.athlete_id)
 
-    @patch('intervals_client.requests.Session')
-    def test_initialization(self, mock_session):
+    def test_initialization(self):
         """Test client initialization."""
         client = IntervalsClient("key", "athlete_id")
         self.assertEqual(client.api_key, "key")
         self.assertEqual(client.athlete_id, "athlete_id")
 
-    @patch('intervals_client.requests.Session.get')
-    def test_get_athlete_profile(self, mock_get):
+    def test_get_athlete_profile(self):
         """Test fetching athlete profile."""
         # Mock response
         mock_response = Mock()
-        mock_response.json.return_value = {
+        mock_response.content = json.dumps({
             'id': 'test_athlete',
             'name': 'Test Athlete',
             'icu_weight': 70.0,
             'icu_resting_hr': 60
-        }
-        mock_get.return_value = mock_response
+        }).encode()
+        self.mock_get.return_value = mock_response
 
         # Test
         profile = self.client.get_athlete_profile()
@@ -47,14 +52,13 @@ class TestIntervalsClient(unittest.TestCase):
         self.assertEqual(profile['id'], 'test_athlete')
         self.assertEqual(profile['name'], 'Test Athlete')
         self.assertEqual(profile['icu_weight'], 70.0)
-        mock_get.assert_called_once()
+        self.mock_get.assert_called_once()
 
-    @patch('intervals_client.requests.Session.get')
-    def test_get_activities(self, mock_get):
+    def test_get_activities(self):
         """Test fetching activities."""
         # Mock response
         mock_response = Mock()
-        mock_response.json.return_value = [
+        mock_response.content = json.dumps([
             {
                 'id': 'activity1',
                 'type': 'Run',
@@ -67,8 +71,8 @@ class TestIntervalsClient(unittest.TestCase):
                 'distance': 20000,
                 'icu_training_load': 60
             }
-        ]
-        mock_get.return_value = mock_response
+        ]).encode()
+        self.mock_get.return_value = mock_response
 
         # Test
         activities = self.client.get_activities(
@@ -80,22 +84,21 @@ class TestIntervalsClient(unittest.TestCase):
         self.assertEqual(len(activities), 2)
         self.assertEqual(activities[0]['type'], 'Run')
         self.assertEqual(activities[1]['type'], 'Ride')
-        mock_get.assert_called_once()
+        self.mock_get.assert_called_once()
 
-    @patch('intervals_client.requests.Session.get')
-    def test_get_activity_detail(self, mock_get):
+    def test_get_activity_detail(self):
         """Test fetching single activity detail."""
         # Mock response
         mock_response = Mock()
-        mock_response.json.return_value = {
+        mock_response.content = json.dumps({
             'id': 'activity1',
             'type': 'Run',
             'distance': 5000,
             'moving_time': 1800,
             'average_heartrate': 150,
             'icu_training_load': 45
-        }
-        mock_get.return_value = mock_response
+        }).encode()
+        self.mock_get.return_value = mock_response
 
         # Test
         activity = self.client.get_activity_detail('activity1')
@@ -104,33 +107,43 @@ class TestIntervalsClient(unittest.TestCase):
         self.assertEqual(activity['id'], 'activity1')
         self.assertEqual(activity['distance'], 5000)
         self.assertEqual(activity['moving_time'], 1800)
-        mock_get.assert_called_once()
+        self.mock_get.assert_called_once()
 
-    @patch('intervals_client.requests.Session.get')
-    def test_fetch_training_data(self, mock_get):
+    def test_fetch_training_data(self):
         """Test comprehensive training data fetch."""
         # Mock responses for multiple calls
         profile_response = Mock()
-        profile_response.json.return_value = {
+        profile_response.content = json.dumps({
             'id': 'test_athlete',
             'icu_weight': 70.0,
             'ctl': 25.0,
             'atl': 20.0
-        }
+        }).encode()
 
         activities_response = Mock()
-        activities_response.json.return_value = [
+        activities_response.content = json.dumps([
             {'id': 'act1', 'type': 'Run', 'icu_training_load': 45},
             {'id': 'act2', 'type': 'Ride', 'icu_training_load': 60}
-        ]
+        ]).encode()
 
         wellness_response = Mock()
-        wellness_response.json.return_value = [
+        wellness_response.content = json.dumps([
             {'id': '2025-10-26', 'restingHR': 60, 'hrv': 45}
-        ]
-
-        # Configure mock to return different responses
-        mock_get.side_effect = [profile_response, activities_response, wellness_response]
+        ]).encode()
+
+        # Dispatch responses by URL since the fetches run concurrently
+        def get_by_url(url, **kwargs):
+            if 'activities' in url:
+                return activities_response
+            if 'wellness' in url:
+                return wellness_response
+            if 'fitness-trend' in url:
+                trends_response = Mock()
+                trends_response.content = json.dumps([]).encode()
+                return trends_response
+            return profile_response
+
+        self.mock_get.side_effect = get_by_url
 
         # Test
         data = self.client.fetch_training_data(days_back=30)
@@ -151,21 +164,31 @@ class TestIntervalsClient(unittest.TestCase):
         self.assertEqual(data['date_range']['start'], start_date.isoformat())
         self.assertEqual(data['date_range']['end'], today.isoformat())
 
-    @patch('intervals_client.requests.Session.get')
-    def test_fetch_training_data_wellness_error(self, mock_get):
+    def test_fetch_training_data_wellness_error(self):
         """Test training data fetch when wellness data fails."""
         # Mock responses
         profile_response = Mock()
-        profile_response.json.return_value = {'id': 'test_athlete'}
+        profile_response.content = json.dumps({'id': 'test_athlete'}).encode()
 
         activities_response = Mock()
-        activities_response.json.return_value = [{'id': 'act1'}]
+        activities_response.content = json.dumps([{'id': 'act1'}]).encode()
 
         # Wellness request fails
         wellness_response = Mock()
         wellness_response.raise_for_status.side_effect = Exception("Wellness not available")
 
-        mock_get.side_effect = [profile_response, activities_response, wellness_response]
+        def get_by_url(url, **kwargs):
+            if 'activities' in url:
+                return activities_response
+            if 'wellness' in url:
+                return wellness_response
+            if 'fitness-trend' in url:
+                trends_response = Mock()
+                trends_response.content = json.dumps([]).encode()
+                return trends_response
+            return profile_response
+
+        self.mock_get.side_effect = get_by_url
 
         # Test - should not raise exception
         data = self.client.fetch_training_data(days_back=7)
@@ -173,13 +196,12 @@ class TestIntervalsClient(unittest.TestCase):
         # Assertions - wellness should be empty
         self.assertEqual(data['wellness'], [])
 
-    @patch('intervals_client.requests.Session.get')
-    def test_api_error_handling(self, mock_get):
+    def test_api_error_handling(self):
         """Test handling of API errors."""
         # Mock error response
         mock_response = Mock()
         mock_response.raise_for_status.side_effect = Exception("API Error")
-        mock_get.return_value = mock_response
+        self.mock_get.return_value = mock_response
 
         # Test - should raise exception
         with self.assertRaises(Exception):